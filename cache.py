@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class S3FIFOCache(MutableMapping):
+    """
+    Bounded in-memory cache using the S3-FIFO eviction policy (Yang et al., SOSP 2023).
+
+    New keys enter a small FIFO (10% of maxsize). Keys that are read again while there are promoted
+    to the main FIFO; the rest are evicted early and remembered in a "ghost" FIFO of keys only, so a
+    key that comes back soon after is admitted straight into main. The main FIFO gives entries that
+    were read since their last pass another round before evicting them. One-hit wonders (long-tail
+    movie IDs, typo searches) therefore can't push popular entries out the way they do under LRU.
+    """
+
+    MAX_FREQ = 3
+
+    def __init__(self, maxsize:int, small_ratio:float = 0.1):
+        if maxsize < 2:
+            raise ValueError("S3FIFOCache maxsize must be at least 2.")
+
+        self.maxsize = maxsize
+        self._small_size = max(1, int(maxsize * small_ratio))
+        self._main_size = maxsize - self._small_size
+        # key -> [value, freq]
+        self._small: OrderedDict = OrderedDict()
+        self._main: OrderedDict = OrderedDict()
+        # Recently evicted keys (no values)
+        self._ghost: OrderedDict = OrderedDict()
+
+    def _entry(self, key):
+        entry = self._small.get(key)
+        if entry is None:
+            entry = self._main.get(key)
+        return entry
+
+    def get(self, key, default=None):
+        entry = self._entry(key)
+        if entry is None:
+            return default
+        if entry[1] < self.MAX_FREQ:
+            entry[1] += 1
+        return entry[0]
+
+    def __getitem__(self, key):
+        entry = self._entry(key)
+        if entry is None:
+            raise KeyError(key)
+        if entry[1] < self.MAX_FREQ:
+            entry[1] += 1
+        return entry[0]
+
+    def __setitem__(self, key, value):
+        entry = self._entry(key)
+        if entry is not None:
+            # Updates keep the entry's position and frequency
+            entry[0] = value
+            return
+
+        while len(self) >= self.maxsize:
+            self._evict()
+
+        if key in self._ghost:
+            del self._ghost[key]
+            self._main[key] = [value, 0]
+        else:
+            self._small[key] = [value, 0]
+
+    def __delitem__(self, key):
+        if key in self._small:
+            del self._small[key]
+        else:
+            del self._main[key]
+
+    def __contains__(self, key):
+        return key in self._small or key in self._main
+
+    def __iter__(self):
+        yield from self._small
+        yield from self._main
+
+    def __len__(self):
+        return len(self._small) + len(self._main)
+
+    def _evict(self):
+        if len(self._small) >= self._small_size or not self._main:
+            self._evict_small()
+        else:
+            self._evict_main()
+
+    def _evict_small(self):
+        while self._small:
+            key, entry = self._small.popitem(last=False)
+            if entry[1] > 0:
+                # Read again while in the small queue: promote to main
+                entry[1] = 0
+                self._main[key] = entry
+                if len(self._main) > self._main_size:
+                    self._evict_main()
+            else:
+                self._ghost[key] = None
+                if len(self._ghost) > self._main_size:
+                    self._ghost.popitem(last=False)
+                return
+
+    def _evict_main(self):
+        while self._main:
+            key, entry = self._main.popitem(last=False)
+            if entry[1] > 0:
+                # Read since its last pass: give it another round
+                entry[1] -= 1
+                self._main[key] = entry
+            else:
+                return
@@ -1,51 +1,58 @@
+import asyncio
+import orjson
+import os
 import time # <--- NEW: Import time for timing the request
 from fastapi import FastAPI, HTTPException, Path, Query
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, PositiveInt
+from schemas_openapi import BatchResponse, MovieDetailsResponse, SearchResponse
 from movie_client import MovieAPIClient
+from cache import S3FIFOCache
 import uvicorn
-from typing import List, Optional
+from typing import Any, List, Optional
 
-# --- 1. Pydantic Data Models (Request/Response Validation) ---
+# --- 1. Pydantic Data Models (Request Validation) ---
+# Response shapes are documented by the OpenAPI-only models in schemas_openapi.py.
 
-class MovieDetailsResponse(BaseModel):
+class BatchRequest(BaseModel):
     """
-    Defines the structured response format for our public API (for single movie details).
+    Defines the request body for fetching several movies in one call.
     """
-    movie_id: int = Field(..., description="The unique identifier of the movie.")
-    title: str = Field(..., description="The official title of the movie.")
-    release_date: Optional[str] = Field(None, description="The release date (YYYY-MM-DD format), or null if unavailable.")
-    rating: float = Field(..., description="The average TMDB user rating.")
-    summary: str = Field(..., description="A short summary or overview of the plot.")
-    # NEW FIELD for demonstrating performance
-    duration_ms: float = Field(..., description="Time taken to retrieve this result (Cache Hit: < 5ms, Cache Miss: > 100ms).")
-
-class MovieSearchResult(BaseModel):
-    """
-    Defines the condensed structure for a single result in a search list.
-    """
-    movie_id: int = Field(..., description="The unique identifier of the movie.")
-    title: str = Field(..., description="The official title of the movie.")
-    release_date: Optional[str] = Field(None, description="The release date (YYYY-MM-DD format), or null if unavailable.")
+    ids: List[PositiveInt] = Field(..., min_length=1, max_length=50, description="TMDB movie IDs to fetch (at most 50).")
 
-class SearchResponse(BaseModel):
-    """
-    Defines the structured response for the movie search endpoint.
-    """
-    query: str = Field(..., description="The search term used.")
-    total_results: int = Field(..., description="Total number of results found by the external API.")
-    results: List[MovieSearchResult] = Field(..., description="A list of movies matching the search query.")
-    # NEW FIELD for demonstrating performance
-    duration_ms: float = Field(..., description="Time taken to retrieve this search result (Cache Hit: < 5ms, Cache Miss: > 100ms).")
+# Retrieval timing is reported in response headers (not the body) so it never affects the JSON payload
+TIMING_HEADERS = {
+    "X-Cache-Duration-Ms": {"description": "Time taken to retrieve the result (Cache Hit: < 5ms, Cache Miss: > 100ms).", "schema": {"type": "string"}},
+    "X-Cache": {"description": "HIT or MISS, derived from X-Cache-Duration-Ms.", "schema": {"type": "string"}}
+}
 
 
 # --- 2. FastAPI Application Setup ---
 
+class EncodedORJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse that also accepts an already-encoded JSON body (bytes) and sends it as-is.
+    """
+
+    def render(self, content: Any) -> bytes:
+        # Cached bodies are handed over already encoded
+        if isinstance(content, bytes):
+            return content
+        return super().render(content)
+
 app = FastAPI(
     title="TMDB Movie Info Wrapper (with Caching)",
-    description="A FastAPI wrapper to fetch validated movie details from TMDB, now featuring a search endpoint and ** automatic in-memory caching ** for client requests.",
-    version="1.1.0"
+    description="A FastAPI wrapper to fetch structured movie details from TMDB, now featuring a search endpoint and ** automatic in-memory caching ** for client requests.",
+    version="1.1.0",
+    # orjson serializes our plain-dict payloads far faster than the stdlib json encoder
+    default_response_class=ORJSONResponse
 )
 
+# Compress larger JSON bodies (search results, batches, appended sub-resources) for clients that accept gzip.
+# Level 5 keeps most of the size reduction at a fraction of level 9's CPU cost.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Initialize the external client globally
 try:
     tmdb_client = MovieAPIClient()
@@ -55,6 +62,81 @@ except ValueError as e:
     print(f"FATAL: {e}")
     tmdb_client = None
 
+# Maximum number of TMDB_WARM_IDS fetched concurrently at startup
+WARM_CONCURRENCY = 10
+
+@app.on_event("startup")
+async def warm_tmdb_cache():
+    """Prefetches the movie IDs listed in TMDB_WARM_IDS (a JSON list, e.g. [24428, 603]) into the cache."""
+    if not tmdb_client:
+        return
+
+    try:
+        warm_ids = orjson.loads(os.getenv("TMDB_WARM_IDS", "[]"))
+        # Strings and objects are iterable too, so reject anything that isn't a list up front
+        if not isinstance(warm_ids, list):
+            raise TypeError(f"got {type(warm_ids).__name__}")
+    except (orjson.JSONDecodeError, TypeError) as e:
+        print(f"Ignoring invalid TMDB_WARM_IDS (expected a JSON list of movie IDs): {e}")
+        return
+
+    # Only positive integers are movie IDs (type() check, since bool is an int and int() would accept "603" or 1.9)
+    movie_ids = [movie_id for movie_id in warm_ids if type(movie_id) is int and movie_id > 0]
+    rejected = [movie_id for movie_id in warm_ids if not (type(movie_id) is int and movie_id > 0)]
+    if rejected:
+        print(f"Ignoring invalid movie IDs in TMDB_WARM_IDS: {rejected}")
+    if not movie_ids:
+        return
+
+    # Bound the fan-out so a long warm list doesn't open a burst of connections against TMDB's rate limit
+    semaphore = asyncio.Semaphore(WARM_CONCURRENCY)
+
+    async def warm(movie_id:int):
+        async with semaphore:
+            await tmdb_client.get_movie_details(movie_id)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(warm(movie_id) for movie_id in movie_ids), return_exceptions=True)
+    duration_ms = round((time.perf_counter() - start_time) * 1000, 2)
+    print(f"Cache warmed with {len(movie_ids)} movie(s) in {duration_ms}ms. Cache stats: {tmdb_client.cache_stats()}")
+
+@app.on_event("shutdown")
+async def close_tmdb_client():
+    """Closes the pooled HTTP connections to TMDB on shutdown."""
+    if tmdb_client:
+        await tmdb_client.aclose()
+
+# TMDB sub-resources that can be fetched in the same round-trip via append_to_response
+MOVIE_INCLUDES = frozenset({
+    "alternative_titles", "credits", "external_ids", "images", "keywords",
+    "recommendations", "release_dates", "reviews", "similar", "translations", "videos"
+})
+
+def movie_payload(movie_data: dict) -> dict:
+    """Maps a TMDB movie payload to our public movie details shape (see MovieDetails)."""
+    return {
+        "movie_id": movie_data["id"],
+        "title": movie_data["title"],
+        "release_date": movie_data.get("release_date"),
+        "rating": movie_data["vote_average"],
+        "summary": movie_data["overview"]
+    }
+
+# Encoded /movies/{movie_id} bodies keyed by (movie_id, include tuple), stored as (payload version, body). When the
+# client stores new TMDB data for a movie its version changes, so the stale body is simply not reused. Only the
+# version number is kept, never the decoded payload itself.
+movie_body_cache = S3FIFOCache(maxsize=1024)
+
+# Client-call durations below this are reported as cache hits (TMDB round-trips take > 100ms)
+CACHE_HIT_THRESHOLD_MS = 5.0
+
+def timing_headers(duration_ms: float) -> dict:
+    """Builds the X-Cache-Duration-Ms / X-Cache response headers for a client-call duration."""
+    return {
+        "X-Cache-Duration-Ms": f"{duration_ms:.2f}",
+        "X-Cache": "HIT" if duration_ms < CACHE_HIT_THRESHOLD_MS else "MISS"
+    }
+
 # --- 3. API Endpoints ---
 
 @app.get("/")
@@ -62,17 +144,31 @@ async def root():
     """Simple root endpoint to confirm API is running."""
     return {"message": "Movie Info Wrapper API is running. Go to /docs for interactive documentation."}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Reports the external client's cache hit rate and entry counts."""
+    if not tmdb_client:
+        raise HTTPException(
+            status_code=503, 
+            detail="External API Client failed to initialize. Check environment variables."
+        )
+    return tmdb_client.cache_stats()
+
 @app.get(
     "/movies/{movie_id}", 
-    response_model=MovieDetailsResponse,
+    response_model=None,
+    responses={200: {"model": MovieDetailsResponse, "headers": TIMING_HEADERS}},
     summary="Get details for a specific movie",
-    description="Fetches and validates core movie details by TMDB ID. **Results are cached in-memory for fast repeated access.**"
+    description="Fetches core movie details by TMDB ID and maps them to a compact response. **Results are cached in-memory for fast repeated access.**"
 )
 async def get_movie(
-    movie_id: int = Path(..., description="The TMDB ID of the movie to fetch (e.g., 24428 for The Avengers).", ge=1)
+    movie_id: int = Path(..., description="The TMDB ID of the movie to fetch (e.g., 24428 for The Avengers).", ge=1),
+    include: Optional[str] = Query(None, description="Comma-separated TMDB sub-resources to fetch in the same request (e.g., credits,videos).")
 ):
     """
-    Fetches movie details from the external client and maps them to our Pydantic model.
+    Fetches movie details from the external client and maps them to our public response shape.
+    The payload is returned as a plain dict (documented by MovieDetailsResponse) to skip
+    FastAPI's response validation and jsonable_encoder pass.
     """
     if not tmdb_client:
         raise HTTPException(
@@ -80,11 +176,20 @@ async def get_movie(
             detail="External API Client failed to initialize. Check environment variables."
         )
 
+    # Sorted + de-duplicated so "videos,credits" and "credits,videos" share one cache entry
+    append = tuple(sorted({name.strip() for name in include.split(",") if name.strip()})) if include else ()
+    unknown = [name for name in append if name not in MOVIE_INCLUDES]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported include value(s): {', '.join(unknown)}. Allowed: {', '.join(sorted(MOVIE_INCLUDES))}."
+        )
+
     # NEW: Start timing the client call
     start_time = time.perf_counter()
     
     # 1. Fetch data from external client (caching handled inside movie_client)
-    movie_data = tmdb_client.get_movie_details(movie_id)
+    movie_data, version = await tmdb_client.get_movie_details_versioned(movie_id, append)
     
     # NEW: Stop timing the client call
     end_time = time.perf_counter()
@@ -101,30 +206,85 @@ async def get_movie(
             detail=f"External API Error: {movie_data.get('message', 'Check client logs.')}"
         )
 
-    # 3. Validate and transform data for our public response structure
+    # 3. Reuse the already-encoded body if it was built from this payload version (no mapping, no encoding)
+    cache_key = (movie_id, append)
+    cached = movie_body_cache.get(cache_key)
+    if cached is not None and cached[0] == version:
+        return EncodedORJSONResponse(cached[1], headers=timing_headers(duration_ms))
+
+    # 4. Transform data for our public response structure
     try:
         # Map TMDB response keys to our desired output keys
-        validated_response = MovieDetailsResponse(
-            movie_id=movie_data.get("id"),
-            title=movie_data.get("title"),
-            release_date=movie_data.get("release_date"),
-            rating=movie_data.get("vote_average"),
-            summary=movie_data.get("overview"),
-            duration_ms=duration_ms # Include timing
-        )
-        return validated_response
+        payload = movie_payload(movie_data)
+        if append:
+            payload["included"] = {name: movie_data.get(name) for name in append}
+        response = ORJSONResponse(payload, headers=timing_headers(duration_ms))
+        movie_body_cache[cache_key] = (version, response.body)
+        return response
         
     except Exception as e:
         print(f"Validation/Mapping Error: {e}")
-        # If mapping or validation fails (e.g., a required field is missing in TMDB response)
+        # If mapping fails (e.g., a required field is missing in TMDB response)
         raise HTTPException(
             status_code=500, 
             detail="Error processing external data structure. Internal service error."
         )
 
+@app.post(
+    "/movies:batch",
+    response_model=None,
+    responses={200: {"model": BatchResponse, "headers": TIMING_HEADERS}},
+    summary="Get details for several movies at once",
+    description="Fetches up to 50 movies by TMDB ID in one call. TMDB lookups run concurrently and share the in-memory cache."
+)
+async def get_movies_batch(request: BatchRequest):
+    """
+    Fans out to the external client for every requested ID and collects successes and per-movie errors.
+    """
+    if not tmdb_client:
+        raise HTTPException(
+            status_code=503, 
+            detail="External API Client failed to initialize. Check environment variables."
+        )
+
+    # Duplicate IDs would only hit the cache again, so fetch each one once
+    movie_ids = list(dict.fromkeys(request.ids))
+
+    start_time = time.perf_counter()
+
+    # 1. Fetch all movies concurrently (wall time ~ slowest call instead of the sum)
+    fetched = await asyncio.gather(
+        *(tmdb_client.get_movie_details(movie_id) for movie_id in movie_ids),
+        return_exceptions=True
+    )
+
+    end_time = time.perf_counter()
+    duration_ms = round((end_time - start_time) * 1000, 2)
+
+    # 2. Split successes from failures
+    results = []
+    errors = []
+    for movie_id, movie_data in zip(movie_ids, fetched):
+        if isinstance(movie_data, BaseException):
+            print(f"Batch fetch error for movie ID {movie_id}: {movie_data}")
+            errors.append({"movie_id": movie_id, "detail": "Internal service error."})
+        elif movie_data is None:
+            errors.append({"movie_id": movie_id, "detail": "Movie not found."})
+        elif 'error' in movie_data:
+            errors.append({"movie_id": movie_id, "detail": f"External API Error: {movie_data.get('message', 'Check client logs.')}"})
+        else:
+            try:
+                results.append(movie_payload(movie_data))
+            except Exception as e:
+                print(f"Batch Validation/Mapping Error for movie ID {movie_id}: {e}")
+                errors.append({"movie_id": movie_id, "detail": "Error processing external data structure."})
+
+    return ORJSONResponse({"results": results, "errors": errors}, headers=timing_headers(duration_ms))
+
 @app.get(
     "/search", 
-    response_model=SearchResponse,
+    response_model=None,
+    responses={200: {"model": SearchResponse, "headers": TIMING_HEADERS}},
     summary="Search for movies by name",
     description="Searches TMDB for movies matching the query. **Results are cached in-memory for fast repeated access.**"
 )
@@ -134,6 +294,13 @@ async def search_movie(
     """
     Searches for movies using the external client and returns a list of matching titles.
     """
+    # min_length counts whitespace, so also require 2 characters once surrounding whitespace is stripped
+    if len(query.strip()) < 2:
+        raise HTTPException(
+            status_code=422,
+            detail="Search query must contain at least 2 non-whitespace characters."
+        )
+
     if not tmdb_client:
         raise HTTPException(
             status_code=503, 
@@ -144,7 +311,7 @@ async def search_movie(
     start_time = time.perf_counter()
 
     # 1. Fetch data from external client (caching handled inside movie_client)
-    search_data = tmdb_client.search_movies(query)
+    search_data = await tmdb_client.search_movies(query)
 
     # NEW: Stop timing the client call
     end_time = time.perf_counter()
@@ -159,26 +326,22 @@ async def search_movie(
     
     if not search_data or 'results' not in search_data:
          # Treat empty results as a successful search but no match
-        return SearchResponse(query=query, total_results=0, results=[], duration_ms=duration_ms)
+        return ORJSONResponse({"query": query, "total_results": 0, "results": []}, headers=timing_headers(duration_ms))
 
-    # 3. Validate and transform results
+    # 3. Transform results
     try:
-        results_list = []
-        for item in search_data.get("results", []):
-            # We use the condensed MovieSearchResult model here
-            results_list.append(MovieSearchResult(
-                movie_id=item.get("id"),
-                title=item.get("title"),
-                release_date=item.get("release_date")
-            ))
-
-        validated_response = SearchResponse(
-            query=query,
-            total_results=search_data.get("total_results", len(results_list)),
-            results=results_list,
-            duration_ms=duration_ms # Include timing
-        )
-        return validated_response
+        # Condensed shape documented by the MovieSearchResult model
+        results_list = [
+            {"movie_id": item["id"], "title": item["title"], "release_date": item.get("release_date")}
+            for item in search_data["results"]
+        ]
+
+        payload = {
+            "query": query,
+            "total_results": search_data.get("total_results", len(results_list)),
+            "results": results_list
+        }
+        return ORJSONResponse(payload, headers=timing_headers(duration_ms))
         
     except Exception as e:
         print(f"Search Validation/Mapping Error: {e}")
@@ -191,5 +354,20 @@ async def search_movie(
 
 if __name__ == "__main__":
     # To run the app directly without the CLI command:
-    # uvicorn main:app --reload
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    #   DEV=1 python main.py  -> single worker with auto-reload
+    #   python main.py        -> production: one worker per CPU (or WEB_CONCURRENCY), no access log
+    # Equivalent production CLI:
+    #   uvicorn main:app --host 0.0.0.0 --port 8000 --workers 4 --loop uvloop --http httptools --no-access-log
+    if os.getenv("DEV"):
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+            # "auto" picks uvloop and httptools when installed (they are not available on every platform, e.g. uvloop on Windows)
+            loop="auto",
+            http="auto",
+            access_log=False
+        )
\ No newline at end of file
@@ -1,60 +1,225 @@
-import requests
+import asyncio
+import httpx
+import itertools
+import orjson
 import os
+import time
+from typing import Any, Awaitable, Callable
 from dotenv import load_dotenv
-from functools import lru_cache
+from cache import S3FIFOCache
 
 # Load environmental variables from .env file
 load_dotenv()
 
+# Returned by the fetch helpers when TMDB answers a conditional GET with 304 Not Modified
+NOT_MODIFIED = object()
+
 class MovieAPIClient:
-    BASE_URL = os.getenv("TMDB_BASE_URL")
+    BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
     API_KEY = os.getenv("TMDB_API_KEY")
+    CACHE_TTL = int(os.getenv("TMDB_CACHE_TTL", "3600"))
+    # For this long past CACHE_TTL, stale entries are served immediately while a background task refreshes them
+    STALE_GRACE = int(os.getenv("TMDB_CACHE_STALE_GRACE", "300"))
+    # "Movie not found" answers are cached briefly so repeated requests for a bad ID don't all reach TMDB
+    NEGATIVE_TTL = int(os.getenv("TMDB_CACHE_NEGATIVE_TTL", "60"))
+    # Transient gateway errors from TMDB are retried with exponential backoff
+    RETRY_STATUSES = frozenset({502, 503, 504})
+    MAX_RETRIES = 2
+    RETRY_BACKOFF = 0.2
 
     def __init__(self):
         if not self.API_KEY:
             raise ValueError("TMDB_API_KEY environmental variable value not set. Please check your .env file.")
-        
+
         self.headers = {
             "Authorization": f"Bearer {self.API_KEY}",
             "accept": "application/json"
         }
-    
-    @lru_cache(maxsize=128)
-    def get_movie_details(self, movie_id:int) -> dict|None:
 
-        endpoint = f"{self.BASE_URL}/movie/{movie_id}"
+        # One pooled async client for the whole app, so TCP/TLS connections are reused across cache misses.
+        # The transport also retries failed connection attempts before giving up.
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=30.0),
+            retries=self.MAX_RETRIES
+        )
+        self._client = httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            headers=self.headers,
+            transport=transport,
+            timeout=10.0
+        )
+
+        # In-memory caches of (payload, etag, fetched_at, ttl, version); successful TMDB payloads and "not found" (None)
+        # are stored, errors never are. S3-FIFO keeps popular movies resident better than LRU under skewed
+        # traffic with a long tail. Expired entries are kept (until evicted) so they can be revalidated with their ETag.
+        self._movie_cache = S3FIFOCache(maxsize=1024)
+        self._search_cache = S3FIFOCache(maxsize=512)
+        self._hits = 0
+        self._misses = 0
+        # Each newly stored payload gets a fresh version (a 304 keeps it), so callers can cache derived data per version
+        self._versions = itertools.count(1)
+        # In-flight TMDB fetches, one task per key: concurrent misses and background refreshes all await it
+        self._inflight: dict[Any, asyncio.Task] = {}
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await self._client.aclose()
+
+    def cache_stats(self) -> dict:
+        """Returns hit/miss counters for the movie and search caches (stale-while-revalidate hits count as hits)."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "movie_entries": len(self._movie_cache),
+            "search_entries": len(self._search_cache)
+        }
+
+    async def _cached(self, cache:S3FIFOCache, key, fetch:Callable[..., Awaitable[tuple[Any, bool, str|None]]], *args):
+        """
+        Returns (value, version) for key from the cache, or awaits the single in-flight fetch(*args, etag=...) for it.
+        version is None for results that weren't cached (errors).
+        fetch and its args are passed separately so a cache hit doesn't allocate a closure.
+        Entries less than STALE_GRACE past their TTL are returned as-is while they refresh in the background.
+        """
+        entry = cache.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[2]
+            if age < entry[3]:
+                self._hits += 1
+                return entry[0], entry[4]
+            # Only real payloads are served stale; an expired "not found" is simply fetched again
+            if entry[0] is not None and age < entry[3] + self.STALE_GRACE:
+                self._hits += 1
+                self._fetch_shared(cache, key, fetch, *args)
+                return entry[0], entry[4]
+
+        self._misses += 1
+        # shield() so a caller that goes away doesn't cancel the fetch other callers are waiting on
+        return await asyncio.shield(self._fetch_shared(cache, key, fetch, *args))
+
+    def _fetch_shared(self, cache:S3FIFOCache, key, fetch:Callable[..., Awaitable[tuple[Any, bool, str|None]]], *args) -> asyncio.Task:
+        """
+        Returns the in-flight fetch task for key, starting one if none is running. Every concurrent miss
+        (and background refresh) for the key awaits this same task, so they all get its result, errors
+        included, from a single TMDB call.
+        """
+        task_key = (id(cache), key)
+        task = self._inflight.get(task_key)
+        if task is not None:
+            return task
+
+        task = asyncio.create_task(self._refresh(cache, key, fetch, *args))
+        self._inflight[task_key] = task
+
+        def _done(task:asyncio.Task):
+            del self._inflight[task_key]
+            if not task.cancelled() and task.exception() is not None:
+                print(f"TMDB fetch failed for {key!r}: {task.exception()}")
+
+        task.add_done_callback(_done)
+        return task
+
+    async def _refresh(self, cache:S3FIFOCache, key, fetch:Callable[..., Awaitable[tuple[Any, bool, str|None]]], *args):
+        """
+        Fetches key from TMDB and stores the result; runs as the single in-flight task for key.
+        A stale entry's ETag is passed to fetch() so TMDB can answer 304 and the cached payload is reused.
+        fetch() returns (result, cacheable, etag); a cacheable None ("not found") is kept for NEGATIVE_TTL only.
+        """
+        entry = cache.get(key)
+        result, cacheable, etag = await fetch(*args, etag=entry[1] if entry else None)
+        if not cacheable:
+            return result, None
+
+        if result is NOT_MODIFIED:
+            # Same payload object, same version: anything derived from it stays valid
+            result, version = entry[0], entry[4]
+        else:
+            version = next(self._versions)
+        ttl = self.CACHE_TTL if result is not None else self.NEGATIVE_TTL
+        cache[key] = (result, etag, time.monotonic(), ttl, version)
+        return result, version
+
+    async def get_movie_details(self, movie_id:int, append:tuple[str, ...] = ()) -> dict|None:
+        """
+        Fetches a movie, optionally with TMDB sub-resources (e.g. ("credits", "videos")) appended
+        to the same round-trip via append_to_response. The append tuple is part of the cache key.
+        """
+        return (await self._cached(self._movie_cache, (movie_id, append), self._fetch_movie_details, movie_id, append))[0]
+
+    async def get_movie_details_versioned(self, movie_id:int, append:tuple[str, ...] = ()) -> tuple[dict|None, int|None]:
+        """
+        Same as get_movie_details(), but also returns the cached payload's version. The version changes
+        whenever TMDB returns new data for the movie, and is None when the result wasn't cached (errors).
+        """
+        return await self._cached(self._movie_cache, (movie_id, append), self._fetch_movie_details, movie_id, append)
+
+    async def search_movies(self, query:str) -> dict|None:
+        # Normalize the key so "Batman", " batman " and "the  BATMAN" share one cache entry. Only whitespace is
+        # normalized in what gets sent upstream: casefold() also rewrites characters (e.g. "ß" -> "ss") that
+        # TMDB would otherwise match as typed.
+        query = " ".join(query.split())
+        return (await self._cached(self._search_cache, query.casefold(), self._fetch_search, query))[0]
+
+    @staticmethod
+    def _status_message(response:httpx.Response) -> str:
+        """Extracts TMDB's status_message from an error body (which may not be JSON, e.g. a gateway page)."""
+        try:
+            return orjson.loads(response.content).get("status_message", "Unknown API error")
+        except (orjson.JSONDecodeError, AttributeError):
+            return "Unknown API error"
+
+    async def _get(self, path:str, **kwargs) -> httpx.Response:
+        """GET on the pooled client, retrying TMDB gateway errors (502/503/504)."""
+        for attempt in range(self.MAX_RETRIES + 1):
+            response = await self._client.get(path, **kwargs)
+            if response.status_code not in self.RETRY_STATUSES or attempt == self.MAX_RETRIES:
+                return response
+            await asyncio.sleep(self.RETRY_BACKOFF * 2 ** attempt)
+
+    async def _fetch_movie_details(self, movie_id:int, append:tuple[str, ...] = (), etag:str|None = None) -> tuple[Any, bool, str|None]:
+
+        params = {"append_to_response": ",".join(append)} if append else None
+        headers = {"If-None-Match": etag} if etag else None
 
         try:
-            response = requests.get(endpoint, headers=self.headers)
+            response = await self._get(f"/movie/{movie_id}", params=params, headers=headers)
+            if response.status_code == 304:
+                return NOT_MODIFIED, True, etag
             response.raise_for_status()
 
-            return response.json()
-        
-        except requests.exceptions.HTTPError as e:
+            return orjson.loads(response.content), True, response.headers.get("ETag")
+
+        except httpx.HTTPStatusError as e:
             print(f"HTTP Error fetching movie ID {movie_id} : {e} ")
-            if response.status_code == 404:
-                return None
-            return {"error": f"API error : {response.status_code}", "message": response.json().get("status_message", "Unknown API error")}
-        
-        except requests.exceptions.RequestException as e:
+            if e.response.status_code == 404:
+                return None, True, None
+            return {"error": f"API error : {e.response.status_code}", "message": self._status_message(e.response)}, False, None
+
+        except httpx.RequestError as e:
             print(f"Request failed for movie ID {movie_id} : {e}")
-            return {"error":"Network or Connection error", "message": str(e)}
-        
-    @lru_cache(maxsize=32)
-    def search_movies(self, query:str) -> dict|None:
+            return {"error":"Network or Connection error", "message": str(e)}, False, None
+
+    async def _fetch_search(self, query:str, etag:str|None = None) -> tuple[Any, bool, str|None]:
 
-        endpoint = f"{self.BASE_URL}/search/movie"
         params = {"query" : query}
+        headers = {"If-None-Match": etag} if etag else None
 
         try:
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            response = await self._get("/search/movie", params=params, headers=headers)
+            if response.status_code == 304:
+                return NOT_MODIFIED, True, etag
             response.raise_for_status()
-            return response.json()
-        
-        except requests.exceptions.HTTPError as e:
+
+            return orjson.loads(response.content), True, response.headers.get("ETag")
+
+        except httpx.HTTPStatusError as e:
             print(f"HTTP Error searching for '{query}': {e}")
-            return {"error": f"API Error: {response.status_code}", "message": response.json().get('status_message', 'Unknown API error')}
-        
-        except requests.exceptions.RequestException as e:
+            return {"error": f"API Error: {e.response.status_code}", "message": self._status_message(e.response)}, False, None
+
+        except httpx.RequestError as e:
             print(f"Request failed searching for '{query}': {e}")
-            return {"error": "Network or connection error", "message": str(e)}    
\ No newline at end of file
+            return {"error": "Network or connection error", "message": str(e)}, False, None
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+# --- Pydantic Response Schemas (OpenAPI docs only) ---
+# Referenced from the endpoints' `responses=`. Endpoints build plain dicts from the (trusted, known-shape)
+# TMDB payload and encode them with orjson, so none of these models is constructed or validated per request.
+
+class MovieDetails(BaseModel):
+    """
+    Defines the core movie details shared by the single-movie and batch responses.
+    """
+    movie_id: int = Field(..., description="The unique identifier of the movie.")
+    title: str = Field(..., description="The official title of the movie.")
+    release_date: Optional[str] = Field(None, description="The release date (YYYY-MM-DD format), or null if unavailable.")
+    rating: float = Field(..., description="The average TMDB user rating.")
+    summary: str = Field(..., description="A short summary or overview of the plot.")
+
+class MovieDetailsResponse(MovieDetails):
+    """
+    Defines the structured response format for our public API (for single movie details).
+    """
+    included: Optional[Dict[str, Any]] = Field(None, description="TMDB sub-resources requested via `include`, keyed by name (only present when requested).")
+
+class MovieSearchResult(BaseModel):
+    """
+    Defines the condensed structure for a single result in a search list.
+    """
+    movie_id: int = Field(..., description="The unique identifier of the movie.")
+    title: str = Field(..., description="The official title of the movie.")
+    release_date: Optional[str] = Field(None, description="The release date (YYYY-MM-DD format), or null if unavailable.")
+
+class SearchResponse(BaseModel):
+    """
+    Defines the structured response for the movie search endpoint.
+    """
+    query: str = Field(..., description="The search term used.")
+    total_results: int = Field(..., description="Total number of results found by the external API.")
+    results: List[MovieSearchResult] = Field(..., description="A list of movies matching the search query.")
+
+class BatchMovieError(BaseModel):
+    """
+    Defines a per-movie failure inside a batch response.
+    """
+    movie_id: int = Field(..., description="The TMDB ID that could not be fetched.")
+    detail: str = Field(..., description="Why the movie could not be returned.")
+
+class BatchResponse(BaseModel):
+    """
+    Defines the structured response for the batch movie endpoint.
+    """
+    results: List[MovieDetails] = Field(..., description="Details for every movie that was fetched successfully, in request order.")
+    errors: List[BatchMovieError] = Field(..., description="Movies that were not found or failed to fetch.")